@@ -4,22 +4,51 @@
 __version__ = "0.1.2"
 
 import argparse
-import curses
-import glob
+import codecs
+import hashlib
 import os
+import pickle
 import sys
+import tempfile
+from bisect import bisect_right
+from collections import deque
+from fnmatch import fnmatch
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, suppress
+from functools import lru_cache, partial
+from itertools import accumulate, chain, islice
 from textwrap import fill
-from typing import Sequence, NamedTuple, List, Tuple
+from typing import (
+    Any,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from shutil import get_terminal_size
 
 import regex
-import polib
-from tabulate import tabulate
 
 
+@lru_cache(maxsize=1)
 def get_colors():
     """Just returns the CSI codes for red, green, magenta, and reset color.
+
+    They are empty when stdout is not a terminal or NO_COLOR is set.
     """
+    if not sys.stdout.isatty() or os.environ.get("NO_COLOR"):
+        return "", "", "", ""
+    import curses  # pylint: disable=import-outside-toplevel
+
     try:
         curses.setupterm()
         fg_color = curses.tigetstr("setaf") or curses.tigetstr("setf") or ""
@@ -33,30 +62,15 @@ def get_colors():
     return red, green, magenta, no_color
 
 
-RED, GREEN, MAGENTA, NO_COLOR = get_colors()
-
+# Below this number of files, a process pool costs more than it saves.
+PARALLEL_THRESHOLD = 4
 
-def colorize(text, pattern, prefixes=()):
-    """Add CSI color codes to make pattern red in text.
 
-    Optionally also highlight prefixes (as (line, file) tuples) in
-    magenta and green.
-
-    colorize(" file.py:30:foo bar baz", "bar", [("30:","file.py:")]) gives:
-     file.py:30:foo bar baz, with the following colors:
-     |   M  ||G|    |R|
+@lru_cache(maxsize=128)
+def _compile(pattern: str, flags: int = 0) -> Pattern:
+    """Compile pattern, each (pattern, flags) pair being compiled once.
     """
-    result = regex.sub(pattern, RED + r"\g<0>" + NO_COLOR, text)
-    for pnum, pfile in prefixes:
-        prefix = " " + pfile + pnum
-        prefix_colored = regex.escape(
-            regex.sub(pattern, RED + r"\g<0>" + NO_COLOR, prefix)
-        )
-        if regex.escape(RED) in prefix_colored:
-            prefix = prefix_colored
-        prefix_replace = " " + MAGENTA + pfile + GREEN + pnum + NO_COLOR
-        result = regex.sub(prefix, prefix_replace, result, count=1)
-    return result
+    return regex.compile(pattern, flags=flags)
 
 
 class Match(NamedTuple):
@@ -69,87 +83,574 @@ class Match(NamedTuple):
     msgstr: str
 
 
+class SearchOptions(NamedTuple):
+    """Tells where and how to search a pattern.
+    """
+
+    not_in_source: bool = False
+    in_translation: bool = False
+    fixed: bool = False
+    ignore_case: bool = False
+
+
+T = TypeVar("T")
+
+# Matches are handled as plain (file, line, msgid, msgstr) tuples while
+# scanning, which are cheaper to build and to send back from worker
+# processes, and only turned into Match objects by find_in_po.
+RawMatch = Tuple[str, int, str, str]
+
+
+# A plain word, optionally surrounded by word boundaries, as -w does.
+_LITERAL = regex.compile(
+    r"(?:\\b|\(\?<!\\w\)\(\?:)?([A-Za-z0-9_]+)(?:\\b|\)\(\?!\\w\))?"
+)
+
+
+def _literal(compiled: Pattern) -> Optional[str]:
+    """Find the literal any match of compiled has to contain, if easy to tell.
+    """
+    # With IGNORECASE, regex case folding can match what str.lower can't.
+    if not isinstance(compiled.pattern, str) or compiled.flags & (
+        regex.IGNORECASE | regex.VERBOSE
+    ):
+        return None
+    found = _LITERAL.fullmatch(compiled.pattern)
+    return found[1] if found else None
+
+
+def _searcher(
+    pattern: Union[str, Pattern], fixed: bool, ignore_case: bool
+) -> Callable[[str], Any]:
+    """Build the function telling if pattern is found in a given text.
+    """
+    if fixed and isinstance(pattern, str):
+        if ignore_case:
+            lowered = pattern.lower()
+            return lambda text: lowered in text.lower()
+        return lambda text: pattern in text
+    if isinstance(pattern, str):
+        compiled = _compile(pattern, regex.IGNORECASE if ignore_case else 0)
+    else:  # Already compiled with its flags, checked by _scan_paths.
+        compiled = pattern
+    search = compiled.search
+    literal = _literal(compiled)
+    if literal:
+        # Texts not containing the literal can't match, and the
+        # substring test is much faster than running the regex.
+        return lambda text: literal in text and search(text)
+    return search
+
+
+_ESCAPES = {"\\": "\\", "n": "\n", "t": "\t", "r": "\r", '"': '"'}
+_ESCAPE = regex.compile(r'\\(\\|n|t|r|")')
+_CHARSET = regex.compile(rb"charset=([\w-]+)")
+
+
+def _stream_po(filename: str) -> Iterator[Tuple[int, str, str]]:
+    """Parse a .po file, yielding (linenum, msgid, msgstr) tuples.
+
+    A lightweight polib replacement: only what pogrep needs is decoded,
+    and OSError is raised on syntax errors, as polib does.
+    """
+    encoding = "utf-8"
+    start: Optional[int] = None
+    msgid: List[bytes] = []
+    msgstr: Optional[List[bytes]] = None
+    current: Optional[List[bytes]] = None
+    with open(filename, "rb") as po_file:
+        for linenum, line in enumerate(po_file, 1):
+            line = _clean_line(line, linenum)
+            if not line:
+                continue
+            if line.startswith(b'"'):
+                if current is None:
+                    raise _syntax_error(filename, linenum)
+                # Like polib, tolerate strings missing their closing quote.
+                current.append(line[1:-1] if line.endswith(b'"') else line[1:])
+                continue
+            if msgstr is not None and not line.startswith(b"msgstr["):
+                if b"".join(msgid):
+                    yield _entry(start, msgid, msgstr, encoding)
+                else:
+                    encoding = _charset(b"".join(msgstr), encoding)
+                start, msgid, msgstr = None, [], None
+            current = None
+            if start is None:
+                start = linenum
+            if line.startswith(b"#"):
+                continue
+            keyword, value = _parse_keyword(line, filename, linenum)
+            current = [value]
+            if keyword == b"msgid":
+                msgid = current
+            elif keyword.startswith(b"msgstr"):
+                # Plural forms are skipped, leaving an empty msgstr.
+                msgstr = current if keyword == b"msgstr" else msgstr or []
+    if b"".join(msgid) and msgstr is not None:
+        yield _entry(start, msgid, msgstr, encoding)
+
+
+def _clean_line(line: bytes, linenum: int) -> bytes:
+    """Strip a .po file line, and its BOM or obsolete entry marker.
+    """
+    if linenum == 1 and line.startswith(codecs.BOM_UTF8):
+        line = line[len(codecs.BOM_UTF8):]
+    line = line.strip()
+    if line.startswith(b"#~|"):  # Ignored by polib.
+        return b""
+    if line.startswith(b"#~"):
+        # Obsolete entries are parsed as any other entry, as polib does.
+        return line[2:].lstrip()
+    return line
+
+
+_KEYWORDS = (b"msgid", b"msgstr", b"msgctxt", b"msgid_plural")
+
+
+def _parse_keyword(line: bytes, filename: str, linenum: int) -> Tuple[bytes, bytes]:
+    """Split a line like 'msgid "foo"' as its keyword and its string.
+    """
+    keyword, *rest = line.split(None, 1)
+    value = rest[0] if rest else b""
+    if (
+        len(value) < 2
+        or not value.startswith(b'"')
+        or not value.endswith(b'"')
+        or not (keyword in _KEYWORDS or keyword.startswith(b"msgstr["))
+    ):
+        raise _syntax_error(filename, linenum)
+    return keyword, value[1:-1]
+
+
+def _entry(
+    start: Optional[int], msgid: List[bytes], msgstr: List[bytes], encoding: str
+) -> Tuple[int, str, str]:
+    """Build a (linenum, msgid, msgstr) tuple from a parsed entry.
+    """
+    return (
+        start or 0,
+        _decode(b"".join(msgid), encoding),
+        _decode(b"".join(msgstr), encoding),
+    )
+
+
+def _syntax_error(filename: str, linenum: int) -> OSError:
+    """Build the error raised by _stream_po, polib used to raise an OSError too.
+    """
+    return OSError("Syntax error in po file {} (line {})".format(filename, linenum))
+
+
+def _read_error(filename: str) -> str:
+    """Build the message telling filename can't be read as a .po file.
+    """
+    return "{} doesn't seem to be a .po file".format(filename)
+
+
+def _decode(raw: bytes, encoding: str) -> str:
+    """Decode and unescape a po string, like polib does.
+    """
+    text = raw.decode(encoding, "replace")
+    if "\\" not in text:
+        return text
+    return _ESCAPE.sub(lambda match: _ESCAPES[match[1]], text)
+
+
+def _charset(header: bytes, default: str) -> str:
+    """Find the charset declared in a po header, if it's a known one.
+    """
+    found = _CHARSET.search(header)
+    if not found:
+        return default
+    try:
+        return codecs.lookup(found[1].decode("ascii")).name
+    except LookupError:
+        return default
+
+
+# To be bumped when what _stream_po gives changes, invalidating caches.
+CACHE_VERSION = 2
+
+
+def _cache_dir() -> str:
+    """Directory where parsed .po files are cached.
+    """
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pogrep"
+    )
+
+
+def _cached_pofile(filename: str) -> Iterator[Tuple[int, str, str]]:
+    """Like _stream_po, using a cache invalidated when the file changes.
+
+    The cache is disabled by setting the POGREP_NO_CACHE environment variable.
+    """
+    if os.environ.get("POGREP_NO_CACHE"):
+        yield from _stream_po(filename)
+        return
+    stat = os.stat(filename)
+    key = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+    cache_path = os.path.join(
+        _cache_dir(),
+        hashlib.blake2b(os.path.abspath(filename).encode("utf-8")).hexdigest(),
+    )
+    try:
+        with open(cache_path, "rb") as cache_file:
+            cached_key, entries = pickle.load(cache_file)
+    except Exception:  # pylint: disable=broad-except
+        cached_key = None  # Any unreadable cache is just parsed again.
+    if cached_key == key:
+        yield from entries
+        return
+    entries = []
+    for entry in _stream_po(filename):
+        entries.append(entry)
+        yield entry
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        # Written aside then moved, so no one can read a partial cache.
+        temp_fd, temp_path = tempfile.mkstemp(dir=_cache_dir())
+    except OSError:
+        return
+    try:
+        with os.fdopen(temp_fd, "wb") as temp_file:
+            pickle.dump((key, entries), temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        with suppress(OSError):
+            os.unlink(temp_path)
+
+
+def _find_all(texts: Sequence[str], needle: str) -> Set[int]:
+    """Indexes of the texts containing needle, searched as a single buffer.
+    """
+    if not texts or "\0" in needle:
+        return set()
+    # NUL can't appear in po strings, so matches never span two texts.
+    buffer = "\0".join(texts)
+    starts = list(chain([0], accumulate(len(text) + 1 for text in texts)))
+    found = set()
+    position = buffer.find(needle)
+    while position != -1:
+        index = bisect_right(starts, position) - 1
+        found.add(index)
+        if index + 1 >= len(texts):
+            break
+        position = buffer.find(needle, starts[index + 1])
+    return found
+
+
+def _matching_entries(
+    entries: Iterable[Tuple[int, str, str]],
+    search: Callable[[str], Any],
+    options: SearchOptions,
+) -> Iterator[Tuple[int, str, str]]:
+    """Filter (linenum, msgid, msgstr) entries, keeping translated matching ones.
+    """
+    # The searched columns don't change from an entry to another, so
+    # pick a loop searching only them instead of testing flags each time.
+    mode = (0 if options.not_in_source else 1) | (2 if options.in_translation else 0)
+    if mode == 1:
+        return (entry for entry in entries if entry[2] and search(entry[1]))
+    if mode == 2:
+        return (entry for entry in entries if entry[2] and search(entry[2]))
+    if mode == 3:
+        return (
+            entry
+            for entry in entries
+            if entry[2] and (search(entry[1]) or search(entry[2]))
+        )
+    # Nothing to search in, but still read entries to report unreadable files.
+    deque(entries, maxlen=0)
+    return iter(())
+
+
+def _scan_one(
+    filename: str,
+    pattern: Union[str, Pattern],
+    options: SearchOptions,
+) -> Tuple[List[str], List[RawMatch]]:
+    """Find the given pattern in a single file.
+    """
+    if options.fixed and isinstance(pattern, str):
+        return _scan_one_fixed(filename, pattern, options)
+    search = _searcher(pattern, options.fixed, options.ignore_case)
+    try:
+        results: List[RawMatch] = [
+            (filename, linenum, msgid, msgstr)
+            for linenum, msgid, msgstr in _matching_entries(
+                _cached_pofile(filename), search, options
+            )
+        ]
+    except OSError:
+        return [_read_error(filename)], []
+    return [], results
+
+
+def _scan_has_match(
+    filename: str, pattern: Union[str, Pattern], options: SearchOptions
+) -> Tuple[List[str], List[str]]:
+    """Tell if the given pattern is in a single file, giving [filename] if so.
+    """
+    search = _searcher(pattern, options.fixed, options.ignore_case)
+    try:
+        for _ in _matching_entries(_cached_pofile(filename), search, options):
+            return [], [filename]
+    except OSError:
+        return [_read_error(filename)], []
+    return [], []
+
+
+def _scan_one_fixed(
+    filename: str, pattern: str, options: SearchOptions
+) -> Tuple[List[str], List[RawMatch]]:
+    """Find the given fixed string in all strings of a single file at once.
+    """
+    try:
+        entries = list(_cached_pofile(filename))
+    except OSError:
+        return [_read_error(filename)], []
+    if options.ignore_case:
+        pattern = pattern.lower()
+    columns = []
+    if not options.not_in_source:
+        columns.append([msgid for _, msgid, _ in entries])
+    if options.in_translation:
+        columns.append([msgstr for _, _, msgstr in entries])
+    found: Set[int] = set()
+    for texts in columns:
+        if options.ignore_case:
+            texts = [text.lower() for text in texts]
+        found |= _find_all(texts, pattern)
+    return (
+        [],
+        [
+            (filename, *entries[index])
+            for index in sorted(found)
+            if entries[index][2]
+        ],
+    )
+
+
+def _scan_paths(
+    scan_file: Callable[..., Tuple[List[str], List[T]]],
+    pattern: Union[str, Pattern],
+    path: Sequence[str],
+    options: SearchOptions,
+    on_error: Optional[Callable[[str], Any]],
+) -> Generator[T, None, None]:
+    """Run scan_file on each file, in parallel when there are many of them.
+    """
+    if (
+        not isinstance(pattern, str)
+        and options.ignore_case
+        and not pattern.flags & regex.IGNORECASE
+    ):
+        raise ValueError("ignore_case needs a pattern compiled with IGNORECASE")
+    if options.fixed and options.ignore_case and isinstance(pattern, str):
+        # Lowering texts is useless if the pattern has no cased characters.
+        options = options._replace(ignore_case=pattern.lower() != pattern.upper())
+    scan = partial(scan_file, pattern=pattern, options=options)
+    scanned: Generator[Tuple[List[str], List[T]], None, None]
+    if len(path) > PARALLEL_THRESHOLD:
+        scanned = _scan_parallel(scan, path)
+    else:
+        scanned = (scan(filename) for filename in path)
+    with closing(scanned):
+        for errors, results in scanned:
+            if on_error is not None:
+                for error in errors:
+                    on_error(error)
+            yield from results
+
+
+def _scan_parallel(
+    scan: Callable[[str], T], path: Sequence[str]
+) -> Generator[T, None, None]:
+    """Run scan on each file in a process pool, yielding results in order.
+
+    Only a few files are queued at once, so the pool stops soon when
+    the caller stops early, like when the output is closed.
+    """
+    workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    paths = iter(path)
+    pending = deque(
+        executor.submit(scan, filename) for filename in islice(paths, 2 * workers)
+    )
+    try:
+        while pending:
+            result = pending.popleft().result()
+            for filename in islice(paths, 1):
+                pending.append(executor.submit(scan, filename))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
 def find_in_po(
-    pattern: str,
+    pattern: Union[str, Pattern],
     path: Sequence[str],
-    not_in_source: bool = False,
-    in_translation: bool = False,
-) -> Tuple[List[str], List[Match]]:
+    options: SearchOptions = SearchOptions(),
+    on_error: Optional[Callable[[str], Any]] = None,
+) -> Generator[Match, None, None]:
     """Find the given pattern in the given list of paths or files.
+
+    Matches are yielded as each file is scanned, errors given to on_error.
+
+    The pattern can be given either as a string or as an already
+    compiled pattern, which must then carry IGNORECASE for ignore_case.
     """
-    results = []
-    errors = []
-    for filename in path:
-        try:
-            pofile = polib.pofile(filename)
-        except OSError:
-            errors.append("{} doesn't seem to be a .po file".format(filename))
-            continue
-        for entry in pofile:
-            if entry.msgstr and (
-                (not not_in_source and regex.search(pattern, entry.msgid))
-                or (in_translation and regex.search(pattern, entry.msgstr))
-            ):
-                results.append(
-                    Match(filename, entry.linenum, entry.msgid, entry.msgstr)
-                )
-    return errors, results
+    results = _scan_paths(_scan_one, pattern, path, options, on_error)
+    with closing(results):
+        for result in results:
+            yield Match(*result)
+
+
+def find_files_in_po(
+    pattern: Union[str, Pattern],
+    path: Sequence[str],
+    options: SearchOptions = SearchOptions(),
+    on_error: Optional[Callable[[str], Any]] = None,
+) -> Generator[str, None, None]:
+    """Find the files containing the given pattern.
+    """
+    return _scan_paths(_scan_has_match, pattern, path, options, on_error)
+
+
+def _grid_line(left: str, middle: str, right: str, width: int) -> str:
+    """A horizontal line of a two columns table, in tabulate's fancy_grid style.
+    """
+    return left + middle[0] * (width + 2) + middle[1] + middle[0] * (width + 2) + right
+
+
+def _color_prefix(head: str, start: int, pfile: str) -> str:
+    """Color a part of a file name and line number prefix, starting at start.
+    """
+    _, green, magenta, no_color = get_colors()
+    split = max(len(pfile) - start, 0)
+    return f"{magenta}{head[:split]}{green}{head[split:]}{no_color}"
+
+
+def _grid_row(
+    match: Match, width: int, prefix: Tuple[str, str], highlight: Callable[[str], str]
+) -> Iterator[str]:
+    """The lines of a table row, showing a match with its msgid after prefix.
+    """
+    left = fill("".join(prefix) + match.msgid, width=width).split("\n")
+    right = fill(match.msgstr, width=width).split("\n")
+    colored = bool(get_colors()[0])
+    shown = 0
+    for index in range(max(len(left), len(right))):
+        cells = []
+        for lines in left, right:
+            line = lines[index] if index < len(lines) else ""
+            padding = " " * (width - len(line))
+            if colored:
+                # A long prefix can be wrapped over several lines.
+                if lines is left and shown < len(prefix[0] + prefix[1]):
+                    head = line[:len(prefix[0] + prefix[1]) - shown]
+                    line = _color_prefix(head, shown, prefix[0]) + highlight(
+                        line[len(head):]
+                    )
+                    shown += len(head)
+                else:
+                    line = highlight(line)
+            cells.append(line + padding)
+        yield f"│ {cells[0]} │ {cells[1]} │"
+
+
+def display_files(files: Iterable[str]):
+    """Display file names, in magenta, as they come.
+    """
+    _, _, magenta, no_color = get_colors()
+    for file in files:
+        print(magenta + file + no_color)
 
 
 def display_results(
-    matches: Sequence[Match], pattern: str, line_number: bool, files_with_matches: bool,
+    matches: Iterable[Match],
+    pattern: Union[str, Pattern],
+    line_number: bool,
+    with_filename: bool = False,
 ):
-    """Display matches as a colorfull table.
+    """Display matches as a colorfull table, as they come.
     """
-    files = {match.file for match in matches}
-    if files_with_matches:  # Just print filenames
-        for file in files:
-            print(MAGENTA + file + NO_COLOR)
-        return
-    prefixes = []
-    table = []
-    term_width = get_terminal_size()[0]
+    red, _, _, no_color = get_colors()
+    if isinstance(pattern, str):
+        pattern = _compile(pattern)
+    highlight = partial(pattern.sub, red + r"\g<0>" + no_color)
+    half_width = (get_terminal_size()[0] - 7) // 2
+    separator = None
     for match in matches:
-        left = match.msgid
-        if line_number:
-            pnum = str(match.line) + ":"
-            if len(files) > 1:
-                pfile = match.file + ":"
-            else:
-                pfile = ""
-            left = pfile + pnum + left
-            prefixes.append((pnum, pfile))
-        table.append(
-            [
-                fill(left, width=(term_width - 7) // 2),
-                fill(match.msgstr, width=(term_width - 7) // 2),
-            ]
+        if separator is None:
+            print(_grid_line("╒", "═╤", "╕", half_width))
+            separator = _grid_line("├", "─┼", "┤", half_width)
+        else:
+            print(separator)
+        prefix = (
+            f"{match.file}:" if with_filename and line_number else "",
+            f"{match.line}:" if line_number else "",
         )
-    print(colorize(tabulate(table, tablefmt="fancy_grid"), pattern, prefixes))
+        for row in _grid_row(match, half_width, prefix, highlight):
+            print(row)
+    if separator is not None:
+        print(_grid_line("╘", "═╧", "╛", half_width))
+
+
+def _walk_po(root: str, exclude_dir: Optional[str] = None) -> Iterator[str]:
+    """Recursively find .po files under root, like glob("**/*.po").
+
+    Directories matching the exclude_dir glob are not descended into.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory or os.curdir) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                path = os.path.join(directory, entry.name) if directory else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not (exclude_dir and fnmatch(entry.name, exclude_dir)):
+                        stack.append(path)
+                elif entry.name.endswith(".po"):
+                    yield path
 
 
-def process_path(path: Sequence[str], recursive: bool) -> List[str]:
+def process_path(
+    path: Sequence[str], recursive: bool, exclude_dir: Optional[str] = None
+) -> List[str]:
     """Apply the recursive flag to the given paths.
 
     Also check that -r is not used on files, that no directories are
     given without -r, and file exists.
+
+    Directories matching the exclude_dir glob are skipped.
     """
     files = []
+    if exclude_dir:
+        exclude_dir = exclude_dir.rstrip(os.sep)
     if len(path) == 0:
         if not recursive:
             sys.exit(0)
-        return glob.glob("**/*.po", recursive=True)
+        return list(_walk_po("", exclude_dir))
     for elt in path:
         if os.path.isfile(elt):
             files.append(elt)
         elif os.path.isdir(elt):
-            if recursive:
-                files.extend(glob.glob(elt + os.sep + "**/*.po", recursive=True))
-            else:
+            if not recursive:
                 print(
                     "{}: {}: Is a directory".format(sys.argv[0], elt), file=sys.stderr
                 )
                 sys.exit(1)
+            if not (
+                exclude_dir
+                and fnmatch(os.path.basename(elt.rstrip(os.sep)), exclude_dir)
+            ):
+                files.extend(_walk_po(elt, exclude_dir))
         else:
             print(
                 "{}: {}: No such file or directory".format(sys.argv[0], elt),
@@ -240,22 +741,39 @@ def main():
     """Command line entry point.
     """
     args = parse_args()
+    fixed = args.fixed_strings and not args.word_regexp
+    literal = args.pattern
     if args.fixed_strings:
         args.pattern = regex.escape(args.pattern)
     if args.word_regexp:
-        args.pattern = r"\b" + args.pattern + r"\b"
-    if args.ignore_case:
-        args.pattern = r"(?i)" + args.pattern
-    files = process_path(args.path, args.recursive)
-    if args.exclude_dir:
-        files = [f for f in files if args.exclude_dir.rstrip(os.sep) + os.sep not in f]
-    errors, results = find_in_po(args.pattern, files, args.no_source, args.translation)
-    if not args.no_messages:
-        for error in errors:
-            print(error, file=sys.stderr)
-    display_results(
-        results, args.pattern, args.line_number, args.files_with_matches,
+        args.pattern = r"(?<!\w)(?:" + args.pattern + r")(?!\w)"
+    pattern = _compile(args.pattern, regex.IGNORECASE if args.ignore_case else 0)
+    files = process_path(args.path, args.recursive, args.exclude_dir)
+    search_args = (
+        literal if fixed else pattern,
+        files,
+        SearchOptions(args.no_source, args.translation, fixed, args.ignore_case),
     )
+    on_error = None if args.no_messages else partial(print, file=sys.stderr)
+    if args.files_with_matches:
+        found = find_files_in_po(*search_args, on_error=on_error)
+    else:
+        found = find_in_po(*search_args, on_error=on_error)
+    try:
+        # Closing stops the scan too, when the output is closed.
+        with closing(found):
+            if args.files_with_matches:
+                display_files(found)
+            else:
+                display_results(
+                    found, pattern, args.line_number, with_filename=len(files) > 1
+                )
+    except BrokenPipeError:
+        # Output was closed early (like in `pogrep ... | head`), see:
+        # https://docs.python.org/3/library/signal.html#note-on-sigpipe
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
 
 
 if __name__ == "__main__":
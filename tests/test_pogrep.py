@@ -1,6 +1,30 @@
+import pickle
+
 import pytest
+import regex
 from test.support import change_cwd
-from pogrep import RED, GREEN, MAGENTA, colorize, NO_COLOR, process_path, find_in_po
+import pogrep
+from pogrep import (
+    Match,
+    SearchOptions,
+    display_files,
+    display_results,
+    process_path,
+    find_in_po,
+    find_files_in_po,
+    _stream_po,
+    _find_all,
+    _compile,
+    _literal,
+)
+
+RED, GREEN, MAGENTA, NO_COLOR = "\x1b[31m", "\x1b[32m", "\x1b[35m", "\x1b(B\x1b[m"
+
+
+@pytest.fixture
+def colors(monkeypatch):
+    monkeypatch.setattr(pogrep, "get_colors", lambda: (RED, GREEN, MAGENTA, NO_COLOR))
+
 
 POText = """
 msgid ""
@@ -28,6 +52,21 @@ msgstr ""
 """
 
 
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch):
+    cache = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache))
+    yield cache
+
+
+def search(pattern, path, **options):
+    errors = []
+    results = list(
+        find_in_po(pattern, path, SearchOptions(**options), on_error=errors.append)
+    )
+    return errors, results
+
+
 @pytest.fixture
 def about_po(tmp_path):
     (tmp_path / "about.po").write_text(POText)
@@ -36,19 +75,26 @@ def about_po(tmp_path):
 
 
 def test_in_source(about_po):
-    errors, results = find_in_po("About", ("about.po",))
+    errors, results = search("About", ("about.po",))
     assert not errors
     assert "about.po" in {result.file for result in results}
+    errors, results = search(
+        regex.compile("about", regex.IGNORECASE), ("about.po",), ignore_case=True
+    )
+    assert results
+    assert results == search("about", ("about.po",), ignore_case=True)[1]
+    with pytest.raises(ValueError):
+        search(regex.compile("about"), ("about.po",), ignore_case=True)
 
 
 def test_not_in_source(about_po):
-    errors, results = find_in_po("propos", ("about.po",))
+    errors, results = search("propos", ("about.po",))
     assert not errors
     assert not results
 
 
 def test_in_translation(about_po):
-    errors, results = find_in_po(
+    errors, results = search(
         "propos", ("about.po",), in_translation=True, not_in_source=True,
     )
     assert not errors
@@ -56,41 +102,64 @@ def test_in_translation(about_po):
 
 
 def test_not_in_translation(about_po):
-    errors, results = find_in_po(
+    errors, results = search(
         "About", ("about.po",), in_translation=True, not_in_source=True,
     )
     assert not errors
     assert not results
 
 
-TEST_TEXT = """Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do
-eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad
-minim veniam, quis nostrud exercitation ullamco laboris nisi ut
-aliquip ex ea commodo consequat. Duis aute irure dolor in
-reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla
-pariatur.  Excepteur sint occaecat cupidatat non proident, sunt in
-culpa qui officia deserunt mollit anim id est laborum."""
-TEST_PREFIXES = [["25:", "glossary.po:"], ["42:", "consectetur:"], ["42:", ""]]
+TEST_MATCHES = [
+    Match("glossary.po", 25, "Lorem ipsum dolor sit amet", "Lorem ipsum"),
+    Match("consectetur.po", 42, "consectetur adipiscing elit", "fugiat nulla"),
+]
 
 
-@pytest.mark.skipif(RED == "", reason="No curses support in this test env.")
-def test_pattern():
-    assert RED + "fugiat" + NO_COLOR in colorize(
-        text=TEST_TEXT, pattern="fugiat", prefixes=[]
-    )
-    assert RED not in colorize(text=TEST_TEXT, pattern="hello", prefixes=[])
+def test_pattern(colors, capsys):
+    display_results(TEST_MATCHES, "fugiat", False)
+    assert RED + "fugiat" + NO_COLOR in capsys.readouterr().out
+    display_results(TEST_MATCHES, "hello", False)
+    assert RED not in capsys.readouterr().out
 
 
-@pytest.mark.skipif(RED == "", reason="No curses support in this test env.")
-def test_prefixes():
-    text = " 42:" + TEST_TEXT
-    assert GREEN + "42:" + NO_COLOR in colorize(
-        text=text, pattern="fugiat", prefixes=TEST_PREFIXES
+def test_prefixes(colors, capsys):
+    display_results(TEST_MATCHES, "consectetur", True, with_filename=True)
+    result = capsys.readouterr().out
+    assert MAGENTA + "glossary.po:" + GREEN + "25:" + NO_COLOR in result
+    assert MAGENTA + "consectetur.po:" + GREEN + "42:" + NO_COLOR in result
+    assert NO_COLOR + RED + "consectetur" + NO_COLOR in result
+    display_results(TEST_MATCHES[:1], "ipsum", True)
+    assert MAGENTA + GREEN + "25:" + NO_COLOR in capsys.readouterr().out
+    display_results(TEST_MATCHES, "ipsum", False, with_filename=True)
+    result = capsys.readouterr().out
+    assert "glossary.po" not in result
+    assert MAGENTA not in result
+
+
+def test_colored_table_is_aligned(colors, capsys):
+    display_results(TEST_MATCHES, "i", True, with_filename=True)
+    lines = capsys.readouterr().out.splitlines()
+    for code in RED, GREEN, MAGENTA, NO_COLOR:
+        lines = [line.replace(code, "") for line in lines]
+    assert len({len(line) for line in lines}) == 1
+
+
+def test_wrapped_prefix(colors, capsys, monkeypatch):
+    monkeypatch.setenv("COLUMNS", "50")
+    match = Match("library/asyncio-eventloop.po", 1234, "Event Loop", "Boucle")
+    display_results([match], "Loop", True, with_filename=True)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1] == (
+        "│ " + MAGENTA + "library/asyncio-event" + GREEN + NO_COLOR
+        + " │ Boucle                │"
+    )
+    assert lines[2] == (
+        "│ " + MAGENTA + "loop.po:" + GREEN + "1234:" + NO_COLOR
+        + "Event    │                       │"
+    )
+    assert lines[3] == (
+        "│ " + RED + "Loop" + NO_COLOR + "                  │                       │"
     )
-    text = " consectetur:" + text[1:]
-    result = colorize(text=text, pattern="consectetur", prefixes=TEST_PREFIXES)
-    assert MAGENTA + "consectetur:" + GREEN + "42:" + NO_COLOR in result
-    assert RED + "consectetur" + NO_COLOR in result
 
 
 @pytest.fixture
@@ -135,3 +204,278 @@ def test_empty_and_recursive(few_files):
         "library/lib1.po",
         "venv/file1.po",
     }
+
+
+def test_compiled_pattern(about_po):
+    errors, results = search(
+        regex.compile("about", regex.IGNORECASE), ("about.po",)
+    )
+    assert not errors
+    assert "about.po" in {result.file for result in results}
+
+
+def test_fixed_strings(about_po):
+    errors, results = search("`Sphinx`_,", ("about.po",), fixed=True)
+    assert not errors
+    assert "about.po" in {result.file for result in results}
+    errors, results = search("sphinx", ("about.po",), fixed=True)
+    assert not results
+    errors, results = search(
+        "sphinx", ("about.po",), fixed=True, ignore_case=True
+    )
+    assert "about.po" in {result.file for result in results}
+    errors, results = search("`_,", ("about.po",), fixed=True, ignore_case=True)
+    assert "about.po" in {result.file for result in results}
+
+
+def test_many_files(about_po):
+    files = ["about{}.po".format(i) for i in range(10)]
+    for file in files:
+        (about_po / file).write_text(POText)
+    errors, results = search("About", files + ["missing.po"])
+    assert errors == ["missing.po doesn't seem to be a .po file"]
+    assert [result.file for result in results] == files
+
+
+def test_stop_early(about_po, cache_home, monkeypatch):
+    monkeypatch.setattr(pogrep.os, "cpu_count", lambda: 1)
+    files = ["about{}.po".format(i) for i in range(20)]
+    for file in files:
+        (about_po / file).write_text(POText)
+    found = find_in_po("About", files)
+    assert next(found).file == "about0.po"
+    found.close()
+    # Scanned files are cached: only the few queued ones were scanned.
+    assert len(list((cache_home / "pogrep").iterdir())) <= 3
+
+
+def test_cache(about_po, cache_home):
+    errors, results = search("About", ("about.po",))
+    assert results
+    assert list((cache_home / "pogrep").iterdir())
+    errors, results = search("About", ("about.po",))
+    assert results
+    (about_po / "about.po").write_text(POText.replace("About", "Regarding"))
+    errors, results = search("About", ("about.po",))
+    assert not results
+    assert len(list((cache_home / "pogrep").iterdir())) == 1
+
+
+def test_cache_version(about_po, cache_home, monkeypatch):
+    errors, results = search("About", ("about.po",))
+    (cache_file,) = (cache_home / "pogrep").iterdir()
+    with open(cache_file, "rb") as cache:
+        key, entries = pickle.load(cache)
+    with open(cache_file, "wb") as cache:
+        pickle.dump((key, [(1, "About", "Stale")]), cache)
+    assert [result.msgstr for result in search("About", ("about.po",))[1]] == [
+        "Stale"
+    ]
+    monkeypatch.setattr(pogrep, "CACHE_VERSION", pogrep.CACHE_VERSION + 1)
+    assert [result.msgstr for result in search("About", ("about.po",))[1]] == [
+        "À propos de ces documents"
+    ]
+    for garbage in pickle.dumps(42), pickle.dumps((1, 2, 3)), b"not a pickle":
+        cache_file.write_bytes(garbage)
+        assert [result.msgstr for result in search("About", ("about.po",))[1]] == [
+            "À propos de ces documents"
+        ]
+
+
+def test_no_cache(about_po, cache_home, monkeypatch):
+    monkeypatch.setenv("POGREP_NO_CACHE", "1")
+    errors, results = search("About", ("about.po",))
+    assert results
+    assert not (cache_home / "pogrep").exists()
+
+
+PLURAL_TEXT = r"""
+msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=ISO-8859-1\n"
+
+#: lib.rst:1
+#, fuzzy
+msgctxt "menu"
+msgid "Open \"file\"\n"
+msgstr "Ouvrir \"fichier\"\n"
+
+msgid "one file"
+msgid_plural "many files"
+msgstr[0] "un fichier"
+msgstr[1] "des fichiers"
+
+#~| msgid "older"
+#~ msgid "obsolete"
+#~ msgstr "obsolète"
+
+msgid "Été"
+msgstr ""
+"été"
+"""
+
+
+def test_stream_po(tmp_path):
+    (tmp_path / "lib.po").write_text(
+        PLURAL_TEXT + '\nmsgid\t"tab"\nmsgstr\t"tabulation"\n', encoding="latin-1"
+    )
+    assert list(_stream_po(str(tmp_path / "lib.po"))) == [
+        (6, 'Open "file"\n', 'Ouvrir "fichier"\n'),
+        (12, "one file", ""),
+        (18, "obsolete", "obsolète"),
+        (21, "Été", "été"),
+        (25, "tab", "tabulation"),
+    ]
+    (tmp_path / "bom.po").write_text("\ufeff" + POText.lstrip(), encoding="utf-8")
+    assert [msgid for _, msgid, _ in _stream_po(str(tmp_path / "bom.po"))] == [
+        "About these documents",
+        "These documents are generated from `reStructuredText`_ sources by "
+        "`Sphinx`_, a document processor specifically written for the Python "
+        "documentation.",
+    ]
+
+
+def test_stream_po_empty(tmp_path):
+    (tmp_path / "empty.po").touch()
+    assert list(_stream_po(str(tmp_path / "empty.po"))) == []
+
+
+def test_stream_po_syntax_error(tmp_path):
+    (tmp_path / "file.txt").write_text("Lorem ipsum\n")
+    with pytest.raises(OSError):
+        list(_stream_po(str(tmp_path / "file.txt")))
+
+
+def test_files_with_matches(about_po):
+    errors, results = search("document", ("about.po",))
+    assert len(results) == 2
+    assert list(find_files_in_po("document", ("about.po",))) == ["about.po"]
+    options = SearchOptions(not_in_source=True)
+    assert list(find_files_in_po("document", ("about.po",), options)) == []
+
+
+def test_find_all():
+    texts = ["foo bar", "", "bar", "baz", "barbar"]
+    assert _find_all(texts, "bar") == {0, 2, 4}
+    assert _find_all(texts, "r\0b") == set()
+    assert _find_all([], "bar") == set()
+
+
+def test_no_color(monkeypatch):
+    monkeypatch.setenv("NO_COLOR", "1")
+    pogrep.get_colors.cache_clear()
+    assert pogrep.get_colors() == ("", "", "", "")
+    pogrep.get_colors.cache_clear()
+
+
+def test_exclude_dir(few_files):
+    assert set(process_path([], recursive=True, exclude_dir="venv/")) == {
+        "first.po",
+        "second.po",
+        "library/lib1.po",
+    }
+    assert set(process_path(["."], recursive=True, exclude_dir="lib*")) == {
+        "./first.po",
+        "./second.po",
+        "./venv/file1.po",
+    }
+    assert process_path(["venv"], recursive=True, exclude_dir="venv") == []
+
+
+def test_compile_cache():
+    assert _compile("abc") is _compile("abc")
+    assert _compile("abc") is not _compile("abc", regex.IGNORECASE)
+
+
+def test_display_results_streams(capsys):
+    def matches():
+        yield TEST_MATCHES[0]
+        assert "Lorem ipsum dolor" in capsys.readouterr().out
+        yield TEST_MATCHES[1]
+
+    display_results(matches(), "consectetur", False)
+    assert "fugiat nulla" in capsys.readouterr().out
+
+
+def test_files_with_matches_output(capsys):
+    display_files(match.file for match in TEST_MATCHES)
+    assert capsys.readouterr().out == "glossary.po\nconsectetur.po\n"
+
+
+def test_in_source_and_translation(about_po):
+    errors, results = search("About|propos|générés", ("about.po",), in_translation=True)
+    assert [result.line for result in results] == [19, 23]
+    errors, results = search(
+        "About", ("about.po",), in_translation=False, not_in_source=True
+    )
+    assert not errors
+    assert not results
+    errors, results = search(
+        "About", ("missing.po",), in_translation=False, not_in_source=True
+    )
+    assert errors == ["missing.po doesn't seem to be a .po file"]
+
+
+@pytest.mark.parametrize(
+    "pattern, literal",
+    [
+        ("foo", "foo"),
+        (r"\bfoo\b", "foo"),
+        (r"(?<!\w)(?:foo)(?!\w)", "foo"),
+        ("fo+", None),
+        ("foo|bar", None),
+        ("(?i)foo", None),
+    ],
+)
+def test_literal(pattern, literal):
+    assert _literal(_compile(pattern)) == literal
+    assert _literal(_compile(pattern, regex.IGNORECASE)) is None
+
+
+def test_find_files_in_po(about_po):
+    files = ["about{}.po".format(i) for i in range(6)]
+    for file in files:
+        (about_po / file).write_text(POText)
+    (about_po / "other.po").write_text(POText.replace("document", "file"))
+    errors = []
+    found = find_files_in_po(
+        "document",
+        files[:3] + ["other.po", "missing.po"] + files[3:],
+        on_error=errors.append,
+    )
+    assert list(found) == files
+    assert errors == ["missing.po doesn't seem to be a .po file"]
+
+
+WORDS_TEXT = """
+msgid "a-foo b"
+msgstr "x"
+
+msgid "foobar"
+msgstr "y"
+
+msgid "bar baz"
+msgstr "z"
+
+msgid "[[] brackets"
+msgstr "crochets"
+"""
+
+
+def test_word_regexp_alternation(tmp_path, monkeypatch, capsys):
+    (tmp_path / "words.po").write_text(WORDS_TEXT)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pogrep", "-w", "foo|bar", "words.po"])
+    pogrep.main()
+    out = capsys.readouterr().out
+    assert "a-foo b" in out
+    assert "bar baz" in out
+    assert "foobar" not in out
+
+
+def test_unnested_character_set(tmp_path, monkeypatch, capsys):
+    (tmp_path / "words.po").write_text(WORDS_TEXT)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pogrep", "[[]", "words.po"])
+    pogrep.main()
+    assert "brackets" in capsys.readouterr().out